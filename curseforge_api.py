@@ -1,30 +1,49 @@
 """Curseforge API wrapper"""
 import os
-from functools import cache
+from functools import lru_cache
 
-import requests
 from dotenv import load_dotenv
 
-load_dotenv()
+import disk_cache
+from http_session import cached_call, create_session
+
+# The .env file lives alongside the script, no need to search the parent directories for it
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+_session = create_session({
+    "Accept": "application/json",
+    "x-api-key": os.getenv("CURSEFORGE_API_KEY")
+}, pool_maxsize=32, connect_retries=0)  # The expired cached responses are used right away when offline
+API_TIMEOUT = (5, 30)  # Connect and read timeouts of the requests, in seconds
 
 
 # Utils
-def call_endpoint(endpoint: str, options: dict = None) -> list[dict]:
+def call_endpoint(endpoint: str, options: dict = None, body: dict = None, ttl: int = 3600) -> dict | list[dict]:
     """
     Call an endpoint of the Curseforge API.
     :param endpoint: The endpoint to call.
     :param options: The options to pass to the endpoint.
+    :param body: <Optional> The JSON body to send, making the call a POST request.
+    :param ttl: The duration for which the response is cached on disk, in seconds, unless the server sets a max-age.
+    Expired responses are still used when the API can't be reached.
     :return: The data returned by the endpoint.
+    :raise requests.exceptions.RequestException: If the call failed and no cached response is available.
     """
-    r = requests.get(f"https://api.curseforge.com{endpoint}", params=options, headers={
-        "Accept": "application/json",
-        "x-api-key": os.getenv("CURSEFORGE_API_KEY")
-    })
-    return r.json()["data"]
+    return cached_call(_session, "curseforge", f"https://api.curseforge.com{endpoint}", options, body, ttl,
+                       API_TIMEOUT)["data"]
+
+
+def clear_cache():
+    """Clear the in-memory and on-disk caches of the Curseforge API responses."""
+    get_minecraft_versions.cache_clear()
+    search_mod.cache_clear()
+    get_fingerprint_matches.cache_clear()
+    get_mods.cache_clear()
+    disk_cache.clear("curseforge")
 
 
 # Functions
-@cache
+@lru_cache(maxsize=512)
 def get_minecraft_versions():
     """
     Get the list of Minecraft versions.
@@ -32,13 +51,13 @@ def get_minecraft_versions():
     """
     versions = call_endpoint("/v1/minecraft/version", options={
         "sortDescending": True
-    })
+    }, ttl=24 * 3600)
     versions_string = list(map(lambda version: version["versionString"], versions))
     versions_string.reverse()
     return versions_string
 
 
-@cache
+@lru_cache(maxsize=512)
 def search_mod(version: str, mod_loader: int, slug: str = None, query: str = None):
     """
     Search for a mod on Curseforge.
@@ -57,3 +76,27 @@ def search_mod(version: str, mod_loader: int, slug: str = None, query: str = Non
         "searchFilter": query,
         "slug": slug
     }.items() if v is not None})
+
+
+@lru_cache(maxsize=512)
+def get_fingerprint_matches(fingerprints: frozenset[int]) -> list[dict]:
+    """
+    Identify several files at once from their fingerprints.
+    :param fingerprints: The fingerprints of the files.
+    :return: The exact matches, each containing the mod id and the matching file.
+    """
+    return call_endpoint("/v1/fingerprints", body={
+        "fingerprints": sorted(fingerprints)
+    })["exactMatches"]
+
+
+@lru_cache(maxsize=512)
+def get_mods(mod_ids: frozenset[int]) -> list[dict]:
+    """
+    Get several mods at once.
+    :param mod_ids: The ids of the mods.
+    :return: The list of mods.
+    """
+    return call_endpoint("/v1/mods", body={
+        "modIds": sorted(mod_ids)
+    })
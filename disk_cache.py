@@ -0,0 +1,82 @@
+"""Persistent on-disk cache for the API responses"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mc-mods-checker")
+MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def _entry_path(namespace: str, key) -> str:
+    """
+    Get the path of the file storing a cache entry.
+    :param namespace: The namespace of the entry.
+    :param key: The key of the entry, any JSON-serializable object.
+    :return: The path of the entry file.
+    """
+    digest = hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, namespace, f"{digest}.json")
+
+
+def max_age(cache_control: str | None) -> int | None:
+    """
+    Get the freshness lifetime set by a Cache-Control header.
+    :param cache_control: The value of the Cache-Control header.
+    :return: The max-age in seconds, 0 if the response must not be reused without revalidation,
+    None if the header doesn't say.
+    """
+    if not cache_control:
+        return None
+    if "no-cache" in cache_control.lower() or "no-store" in cache_control.lower():
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+def load(namespace: str, key) -> tuple[float, int | None, str | None, object] | None:
+    """
+    Load a value from the cache, even if it is expired.
+    :param namespace: The namespace of the value.
+    :param key: The key of the value, any JSON-serializable object.
+    :return: A tuple containing the age of the value in seconds, the max-age set by the server, its ETag and the value,
+    None if it is missing.
+    """
+    try:
+        with open(_entry_path(namespace, key), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return time.time() - entry["time"], entry.get("max_age"), entry.get("etag"), entry["value"]
+
+
+def store(namespace: str, key, value, etag: str = None, max_age: int = None):
+    """
+    Store a value in the cache.
+    :param namespace: The namespace of the value.
+    :param key: The key of the value, any JSON-serializable object.
+    :param value: The value to store, any JSON-serializable object.
+    :param etag: <Optional> The ETag of the response the value comes from, to revalidate it once expired.
+    :param max_age: <Optional> The freshness lifetime set by the server, overriding the default one of the caller.
+    """
+    path = _entry_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so that concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"time": time.time(), "max_age": max_age, "etag": etag, "value": value}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # The cache is only an optimization
+
+
+def clear(namespace: str = None):
+    """
+    Clear the cache.
+    :param namespace: <Optional> The namespace to clear, the whole cache if not provided.
+    """
+    shutil.rmtree(os.path.join(CACHE_DIR, namespace) if namespace else CACHE_DIR, ignore_errors=True)
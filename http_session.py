@@ -0,0 +1,86 @@
+"""Shared configuration of the HTTP sessions"""
+import atexit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+import disk_cache
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional, fall back to the standard library
+    from json import loads as json_loads
+
+
+def create_session(headers: dict = None, pool_maxsize: int = 16, connect_retries: int = None) -> requests.Session:
+    """
+    Create an HTTP session reusing its connections and retrying the failed requests.
+    The requests are retried with an exponential backoff, honoring the Retry-After header of rate-limited responses.
+    :param headers: <Optional> The headers to send with every request of the session.
+    :param pool_maxsize: The maximum number of connections kept open to a single host.
+    :param connect_retries: <Optional> The number of retries on connection errors, to fail fast when offline.
+    As many as the other errors by default.
+    :return: The session, closed when the script exits.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=Retry(
+        total=5,
+        connect=connect_retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,  # The POST endpoints called are read-only lookups, safe to retry
+        respect_retry_after_header=True
+    ))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    atexit.register(session.close)
+    return session
+
+
+def cached_call(session: requests.Session, namespace: str, url: str, options: dict = None, body: dict = None,
+                ttl: int = 3600, timeout: tuple[float, float] = None) -> dict | list[dict]:
+    """
+    Call a JSON API endpoint, caching its response on disk.
+    :param session: The session to send the request with.
+    :param namespace: The namespace of the disk cache to store the response in.
+    :param url: The URL of the endpoint.
+    :param options: <Optional> The query parameters to pass to the endpoint.
+    :param body: <Optional> The JSON body to send, making the call a POST request.
+    :param ttl: The duration for which the response is cached on disk, in seconds, unless the server sets a max-age.
+    Expired responses are still used when the API can't be reached.
+    :param timeout: <Optional> The connect and read timeouts of the request, in seconds.
+    :return: The decoded JSON response.
+    :raise requests.exceptions.RequestException: If the call failed and no cached response is available.
+    """
+    cache_key = [url, sorted((options or {}).items()), body]
+    headers = {}
+    cached = disk_cache.load(namespace, cache_key)
+    if cached:
+        age, max_age, etag, data = cached
+        if age <= (ttl if max_age is None else max_age):
+            return data
+        if etag:
+            # Revalidate the expired response, the server answers 304 without a body if it didn't change
+            headers["If-None-Match"] = etag
+    try:
+        if body is not None:
+            r = session.post(url, params=options, json=body, headers=headers, timeout=timeout)
+        else:
+            r = session.get(url, params=options, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException:
+        if cached:
+            return data  # Offline or unavailable, an expired response is better than none
+        raise
+    if r.status_code == 304:
+        disk_cache.store(namespace, cache_key, data, etag, disk_cache.max_age(r.headers.get("Cache-Control")))
+        return data
+    if r.status_code >= 500 and cached:
+        return data
+    r.raise_for_status()  # The error bodies don't have the shape of the expected data
+    data = json_loads(r.content)
+    disk_cache.store(namespace, cache_key, data, r.headers.get("ETag"),
+                     disk_cache.max_age(r.headers.get("Cache-Control")))
+    return data
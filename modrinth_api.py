@@ -1,23 +1,41 @@
 """Modrinth API wrapper"""
-from functools import cache
+from functools import lru_cache
 
-import requests
+import disk_cache
+from http_session import cached_call, create_session
+
+_session = create_session({
+    "Accept": "application/json"
+}, pool_maxsize=32, connect_retries=0)  # The expired cached responses are used right away when offline
+API_TIMEOUT = (5, 30)  # Connect and read timeouts of the requests, in seconds
 
 
 # Utils
-def call_endpoint(endpoint: str, options: dict = None) -> dict | list[dict]:
+def call_endpoint(endpoint: str, options: dict = None, body: dict = None, ttl: int = 3600) -> dict | list[dict]:
     """
     Call an endpoint of the Modrinth API.
     :param endpoint: The endpoint to call.
     :param options: The options to pass to the endpoint.
+    :param body: <Optional> The JSON body to send, making the call a POST request.
+    :param ttl: The duration for which the response is cached on disk, in seconds, unless the server sets a max-age.
+    Expired responses are still used when the API can't be reached.
     :return: The data returned by the endpoint.
+    :raise requests.exceptions.RequestException: If the call failed and no cached response is available.
     """
-    r = requests.get(f"https://api.modrinth.com{endpoint}", params=options)
-    return r.json()
+    return cached_call(_session, "modrinth", f"https://api.modrinth.com{endpoint}", options, body, ttl, API_TIMEOUT)
+
+
+def clear_cache():
+    """Clear the in-memory and on-disk caches of the Modrinth API responses."""
+    search_mod.cache_clear()
+    get_files_for_mod.cache_clear()
+    get_latest_versions.cache_clear()
+    get_projects.cache_clear()
+    disk_cache.clear("modrinth")
 
 
 # Functions
-@cache
+@lru_cache(maxsize=512)
 def search_mod(version: str, mod_loader: str, query: str):
     """
     Search for a mod on Modrinth.
@@ -32,7 +50,7 @@ def search_mod(version: str, mod_loader: str, query: str):
     })["hits"]
 
 
-@cache
+@lru_cache(maxsize=512)
 def get_files_for_mod(mod_id: str, version: str, mod_loader: int) -> list[list[dict]]:
     """
     Get the files for a mod.
@@ -46,3 +64,32 @@ def get_files_for_mod(mod_id: str, version: str, mod_loader: int) -> list[list[d
         "game_versions": f"[\"{version}\"]"
     })
     return [version["files"] for version in versions]
+
+
+@lru_cache(maxsize=512)
+def get_latest_versions(hashes: frozenset[str], version: str, mod_loader: str) -> dict[str, dict]:
+    """
+    Get the latest version of several mods at once, from the hashes of their local files.
+    :param hashes: The SHA-512 hashes of the local files.
+    :param version: The Minecraft version to search the versions for.
+    :param mod_loader: The mod loader to search the versions for.
+    :return: The latest version of each mod, keyed by the hash of its local file.
+    """
+    return call_endpoint("/v2/version_files/update", body={
+        "hashes": sorted(hashes),
+        "algorithm": "sha512",
+        "loaders": [mod_loader],
+        "game_versions": [version]
+    })
+
+
+@lru_cache(maxsize=512)
+def get_projects(project_ids: frozenset[str]) -> list[dict]:
+    """
+    Get several projects at once.
+    :param project_ids: The ids/slugs of the projects.
+    :return: The list of projects.
+    """
+    return call_endpoint("/v2/projects", options={
+        "ids": "[" + ",".join(f"\"{project_id}\"" for project_id in sorted(project_ids)) + "]"
+    })
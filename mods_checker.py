@@ -5,36 +5,86 @@ import re
 import shutil
 import subprocess
 import sys
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 from urllib.parse import unquote
 
 import psutil
 import requests
+import urllib3
 from beaupy import confirm, select, select_multiple
 from halo import Halo
 from send2trash import send2trash
 
-from curseforge_api import get_minecraft_versions
-from utils import Color, ModLoader, SearchMethod, SearchWebsite
+from curseforge_api import get_fingerprint_matches, get_minecraft_versions, get_mods
+from http_session import create_session
+from modrinth_api import get_files_for_mod, get_latest_versions, get_projects
+from utils import Color, ModLoader, SearchMethod, SearchWebsite, curseforge_fingerprint, file_hash
 
 VERSION = "1.1.4"
+MAX_WORKERS = 8  # Keep concurrent requests well under Modrinth's rate limit (300 requests/minute)
+DIFF_SEPARATORS_TABLE = str.maketrans("+ _", "---")
+LOADER_TOKENS = tuple((mod_loader, str(mod_loader)) for mod_loader in ModLoader)
+LOADER_TOKENS_RE = re.compile("|".join(re.escape(token) for _, token in LOADER_TOKENS))
+LOADER_NAMES = frozenset(token for _, token in LOADER_TOKENS)
+MOD_NAME_PREFIX_RE = re.compile(r"(?:[^\d_-]*[-_])*")  # The words of a file name before the first one with a digit
+CONTENT_DISPOSITION_FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+SPINNER_REFRESH_INTERVAL = 0.1  # Minimum delay between two spinner text updates in loops, in seconds
+FABRIC_META_SERVERS = ["https://meta.fabricmc.net", "https://meta2.fabricmc.net"]
+
+SESSION = create_session()
+
+
+@lru_cache(maxsize=4096)
+def parse_version(version: str) -> tuple[int, ...] | None:
+    """
+    Parse a dotted version number, such as "1.20.1".
+    :param version: The version number to parse.
+    :return: The numbers of the version, None if the string is not a version number.
+    """
+    numbers = version.split(".")
+    if not all(number.isdecimal() for number in numbers):
+        return None
+    return tuple(map(int, numbers))
 
 
-def diff_between_files(file1: str, file2: str) -> dict:
-    """Return the difference between two file names."""
-    diffs = {}
-    file1 = re.sub("[+ _]", "-", file1.removesuffix(".jar"))
-    file2 = re.sub("[+ _]", "-", file2.removesuffix(".jar"))
-    for s1, s2 in zip(file1.split("-"), file2.split("-")):
+@lru_cache(maxsize=4096)
+def file_name_parts(file_name: str) -> tuple[str, ...]:
+    """
+    Split a file name into its dash-separated parts, without the extension.
+    The local file names are compared against many remote files, so they are only split once.
+    :param file_name: The file name to split.
+    :return: The parts of the file name.
+    """
+    return tuple(file_name.removesuffix(".jar").translate(DIFF_SEPARATORS_TABLE).split("-"))
+
+
+def files_differ(file1: str, file2: str) -> bool:
+    """Return whether the second file name is different from the first one, and not an older version of it."""
+    for s1, s2 in zip(file_name_parts(file1), file_name_parts(file2)):
         if s1 != s2:
-            # Compare the parsed strings to int
-            try:
-                s1_num = int(s1.replace(".", ""))
-                s2_num = int(s2.replace(".", ""))
-                if s2_num > s1_num:
-                    diffs[s1] = s2
-            except ValueError:
-                diffs[s1] = s2
-    return diffs
+            # Compare the strings as version numbers if possible, "1.10" being newer than "1.9"
+            s1_version = parse_version(s1)
+            s2_version = parse_version(s2)
+            if s1_version is None or s2_version is None or s2_version > s1_version:
+                return True
+    return False
+
+
+def matches_mod_loader(file_name: str, mod_loader: ModLoader) -> bool:
+    """
+    Check whether a file is meant for a mod loader.
+    :param file_name: The name of the file.
+    :param mod_loader: The mod loader.
+    :return: True if the file name mentions this mod loader or no mod loader at all, False otherwise.
+    """
+    file_mod_loaders = set(LOADER_TOKENS_RE.findall(file_name.lower()))
+    return not file_mod_loaders or str(mod_loader) in file_mod_loaders
 
 
 def check_for_updates(map_of_mods: dict[str, dict], current_version: str, target_version: str, mod_loader: ModLoader):
@@ -54,47 +104,75 @@ def check_for_updates(map_of_mods: dict[str, dict], current_version: str, target
         # Get the origin website to adapt the algorithm
         if "latestFiles" in mod:
             website = SearchWebsite.CURSEFORGE
-            valid = [file for file in mod["latestFiles"]
-                     if file["isAvailable"] and target_version in file["gameVersions"]]
-            files = sorted(valid, key=lambda file: file["fileDate"], reverse=True)
+            # Only the newest available file for the target version and mod loader is a candidate
+            newest_file = max((file for file in mod["latestFiles"]
+                               if file["isAvailable"] and target_version in file["gameVersions"]
+                               and matches_mod_loader(file["fileName"], mod_loader)),
+                              key=itemgetter("fileDate"), default=None)
+            files = [newest_file] if newest_file else []
         else:
             website = SearchWebsite.MODRINTH
             files = mod["files"]
+        mod_name = mod["name"] if website == SearchWebsite.CURSEFORGE else mod["title"]
         # Handle errors
-        if not files and current_version == target_version:
-            _updates_errors.append(f"{mod['name'] if website == SearchWebsite.CURSEFORGE else mod['title']}: "
-                                   + f"No file found for {target_version}, please check and download manually "
-                                   + (
-                                       f"at {mod['links']['websiteUrl']}" if website == SearchWebsite.CURSEFORGE
-                                       else "on Modrinth"
-                                   ))
+        if not files:
+            if current_version == target_version:
+                _updates_errors.append(f"{mod_name}: "
+                                       + f"No file found for {target_version}, please check and download manually "
+                                       + (
+                                           f"at {mod['links']['websiteUrl']}" if website == SearchWebsite.CURSEFORGE
+                                           else "on Modrinth"
+                                       ))
             continue
         # Check for updates
+        local_file_name = file_name_parts(local_file)[0]
         for file in files:
-            if website == SearchWebsite.CURSEFORGE:
-                file_mod_loaders = [mod_loader for mod_loader in ModLoader
-                                    if str(mod_loader) in file["fileName"].lower()]
-                # Continue only if the mod loader is the same or if the file doesn't have a mod loader
-                if file_mod_loaders:
-                    file_mod_loader = file_mod_loaders[0]
-                    if file_mod_loader != mod_loader:
-                        continue
             filename = file["fileName"] if website == SearchWebsite.CURSEFORGE else file["filename"]
-            if filename == local_file or not filename.startswith(local_file.split("-")[0]):
-                break
-            # Check if the file is different
-            if diff_between_files(local_file, filename):
-                _updates[local_file] = {
-                    "fileName": filename,
-                    "downloadUrl": file["downloadUrl"] if website == SearchWebsite.CURSEFORGE else file["url"],
-                }
-                _updates_messages.append(f"{mod['name'] if website == SearchWebsite.CURSEFORGE else mod['title']}: "
-                                         + f"{Color.YELLOW}{local_file}{Color.RESET} -> "
-                                         + f"{Color.GREEN}{filename}{Color.RESET}")
+            if file_name_parts(filename)[0] != local_file_name:
+                continue  # Another file of the mod, such as a library bundled separately
+            # The files are sorted from newest to oldest, the older ones can't be updates once one isn't
+            if filename == local_file or not files_differ(local_file, filename):
                 break
+            _updates[local_file] = {
+                "fileName": filename,
+                "downloadUrl": file["downloadUrl"] if website == SearchWebsite.CURSEFORGE else file["url"],
+            }
+            _updates_messages.append(f"{mod_name}: "
+                                     + f"{Color.YELLOW.colorize(local_file)} -> {Color.GREEN.colorize(filename)}")
+            break
     return _updates, _updates_messages, _updates_errors
 
 
+def find_mod(mod: str, version: str, mod_loader: ModLoader) -> dict | None:
+    """
+    Find the CurseForge/Modrinth mod matching a local mod file.
+    :param mod: The local file name of the mod.
+    :param version: The Minecraft version to search the mod for.
+    :param mod_loader: The mod loader to search the mod for.
+    :return: The mod found with the first successful search method, None otherwise.
+    """
+    # Build the query from the mod name
+    name_prefix = MOD_NAME_PREFIX_RE.match(mod).group()
+    words = name_prefix[:-1].replace("_", "-").split("-") if name_prefix else []
+    last_word = mod[len(name_prefix):]
+    if not any(char.isdigit() for char in last_word):
+        # No version number in the file name, the last word is part of the name
+        words.append(os.path.splitext(last_word)[0])
+    if words and words[-1] in LOADER_NAMES:
+        words.pop()
+    search_query = " ".join(words)
+    if not search_query:
+        return None  # The file name starts with a version number, there is no name to search
+
+    # Search for the mod in Modrinth and CurseForge
+    result = SearchMethod.search_best(search_query, version, mod_loader)
+    if result and "latestFiles" not in result:
+        # Modrinth search results don't include the files of the mod
+        files = get_files_for_mod(result["slug"], version, str(mod_loader))
+        result = {**result, "files": list(chain.from_iterable(files))}
+    return result
+
+
 def download_file(url: str, fallback_name: str) -> tuple[bool, str | None]:
     """
     Download a file from a URL.
@@ -103,11 +181,12 @@ def download_file(url: str, fallback_name: str) -> tuple[bool, str | None]:
     :return: True if the file was downloaded successfully, False otherwise.
     """
     try:
-        with requests.get(url) as dl_response:
+        with SESSION.get(url, stream=True, timeout=(5, 60)) as dl_response:
+            dl_response.raise_for_status()
             file_name = fallback_name
             if "Content-Disposition" in dl_response.headers.keys():
-                matches = re.findall("filename=(.+)", dl_response.headers["Content-Disposition"])
-                if matches and len(matches) > 0:
+                matches = CONTENT_DISPOSITION_FILENAME_RE.findall(dl_response.headers["Content-Disposition"])
+                if matches:
                     file_name = matches[0]
             else:
                 url_name = url.split("/")[-1]
@@ -115,13 +194,102 @@ def download_file(url: str, fallback_name: str) -> tuple[bool, str | None]:
                     file_name = url_name
             file_name = unquote(file_name)
 
-            with open(file_name, "xb") as file:
-                file.write(dl_response.content)
+            # Stream the file to disk instead of loading it entirely in memory,
+            # decoding it if the server compressed it since the raw stream is read directly
+            dl_response.raw.decode_content = True
+            try:
+                with open(file_name, "xb") as file:
+                    content_length = dl_response.headers.get("Content-Length", "")
+                    if content_length.isdecimal() and "Content-Encoding" not in dl_response.headers \
+                            and hasattr(os, "posix_fallocate"):
+                        # Reserve the space of the file at once to avoid fragmenting it
+                        with contextlib.suppress(OSError):
+                            os.posix_fallocate(file.fileno(), 0, int(content_length))
+                    shutil.copyfileobj(dl_response.raw, file, length=DOWNLOAD_CHUNK_SIZE)
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+                os.remove(file_name)  # Don't leave a partially downloaded file behind
+                raise
             return True, file_name
-    except requests.exceptions.RequestException:
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
         return False, None
 
 
+def download_files(files: dict[str, dict]):
+    """
+    Download files concurrently.
+    :param files: The files to download. The key is the local file name, the value contains the file name and URL.
+    :return: A generator of tuples containing the local file name, the file and whether the download succeeded,
+    in the order the downloads complete.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(download_file, file["downloadUrl"], file["fileName"]): local_file
+            for local_file, file in files.items()
+        }
+        for future in as_completed(futures):
+            download_success, _ = future.result()
+            yield futures[future], files[futures[future]], download_success
+
+
+def get_fabric_installer_url() -> str | None:
+    """
+    Get the URL of the latest stable version of Fabric Installer.
+    All the Fabric metadata servers are queried at once, and the first one to answer wins.
+    :return: The URL of Fabric Installer, None if no server answered.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(FABRIC_META_SERVERS))
+    futures = [executor.submit(SESSION.get, f"{server}/v2/versions/installer", timeout=5)
+               for server in FABRIC_META_SERVERS]
+    try:
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+                response.raise_for_status()
+                # Stable version should always be the first/latest one
+                installer_url = next((version["url"] for version in response.json() if version["stable"]), None)
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                continue  # Try the other server
+            if installer_url:
+                return installer_url
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def trash_files(files: list[str], staging_folder: str, executor: ThreadPoolExecutor = None) -> Future | None:
+    """
+    Send files to the trash with a single call, by moving them to a staging folder first.
+    :param files: The files to send to the trash.
+    :param staging_folder: The name of the staging folder, which is sent to the trash along with the files.
+    :param executor: <Optional> The executor to send the staging folder to the trash with, in the background.
+    The files are moved out of the way before returning either way.
+    :return: The future of the background trashing if an executor is given, None otherwise.
+    """
+    if not files:
+        return None
+    os.makedirs(staging_folder, exist_ok=True)
+    for file in files:
+        os.replace(file, os.path.join(staging_folder, file))
+    if executor:
+        return executor.submit(send2trash, staging_folder)
+    send2trash(staging_folder)
+    return None
+
+
+def link_or_copy(file: str, destination_folder: str):
+    """
+    Make a file available in another folder, with a hard link if possible to avoid copying its content.
+    The mods are never modified in place, so sharing the same data between both folders is safe.
+    :param file: The path of the file.
+    :param destination_folder: The folder to make the file available in.
+    """
+    destination = os.path.join(destination_folder, os.path.basename(file))
+    try:
+        os.link(file, destination)
+    except OSError:  # Unsupported by the file system
+        shutil.copy(file, destination)
+
+
 def leave(error: bool = False, message: str = None, silent: bool = False):
     """Exit the script."""
     if error:
@@ -136,20 +304,9 @@ def leave(error: bool = False, message: str = None, silent: bool = False):
 
 
 if __name__ == "__main__":
-    # Check if the CURSEFORGE_API_KEY exists in .env
-    env_path = os.path.join(os.path.dirname(sys.argv[0]), ".env")
-    if os.path.exists(env_path):
-        env_key_found = False
-        for line in open(env_path):
-            if line.startswith("CURSEFORGE_API_KEY"):
-                env_key_found = True
-                if not line.split("=")[1].strip():
-                    leave(True, "Please provide a value for CURSEFORGE_API_KEY in .env")
-                break
-        if not env_key_found:
-            leave(True, "Please set the CURSEFORGE_API_KEY in .env")
-    else:
-        leave(True, "Please create a .env file and set the CURSEFORGE_API_KEY")
+    # Check if the CURSEFORGE_API_KEY is set, the .env file has already been loaded by the Curseforge API wrapper
+    if not os.getenv("CURSEFORGE_API_KEY", "").strip():
+        leave(True, "Please set the CURSEFORGE_API_KEY in .env")
 
     # Start the script
     match sys.platform:
@@ -164,29 +321,50 @@ if __name__ == "__main__":
             leave(True, f"Unsupported platform: {sys.platform}")
 
     with contextlib.chdir(mods_folder):
-        mods = [mod for mod in os.listdir() if os.path.isfile(mod)]
-        if not mods:
-            leave(True, "No mods found in the mods folder")
         mc_versions = get_minecraft_versions()
         mc_versions.reverse()  # Sort from latest to oldest
+        mc_versions_set = frozenset(mc_versions)
+        version_rank = {version: rank for rank, version in enumerate(mc_versions)}
 
-        # Determine the current version and mod loader
-        current_mc_version = None
-        mod_loader_matches: dict[ModLoader, int] = {}
+        # List the mods and determine the current version and mod loader in a single pass
+        mods: list[str] = []
+        mods_versions: set[str] = set()
+        mod_loader_matches: Counter[ModLoader] = Counter()
         spinner = Halo(text="Determining Minecraft version and mod loader")
         spinner.start()
-        for mod in mods:
-            mod_mod_loaders = [mod_loader for mod_loader in ModLoader if str(mod_loader) in mod.lower()]
-            if mod_mod_loaders:
-                mod_mod_loader = mod_mod_loaders[0]
-                mod_loader_matches[mod_mod_loader] = mod_loader_matches.get(mod_mod_loader, 0) + 1
-            for version in mc_versions:
-                if version in mod and (
-                        current_mc_version is None or mc_versions.index(current_mc_version) > mc_versions.index(version)
-                ):
-                    current_mc_version = version
-                    break
-        current_mod_loader = max(mod_loader_matches, key=mod_loader_matches.get)
+        # Find all the versions and mod loaders of a file name in a single scan,
+        # trying the longest versions first so that "1.20.1" wins over "1.20",
+        # and skipping versions that are only part of a longer number such as "11.20.1" or "1.20.10"
+        versions_by_lower = {version.lower(): version for version in mc_versions}
+        detection_re = re.compile(
+            r"(?<!\d)(?<!\d\.)(?P<version>"
+            + "|".join(map(re.escape, sorted(versions_by_lower, key=len, reverse=True)))
+            + r")(?!\.?\d)"
+            + "|(?P<loader>" + "|".join(re.escape(token) for _, token in LOADER_TOKENS) + ")"
+        )
+        with os.scandir() as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                mods.append(entry.name)
+                mod_loader_tokens = set()
+                for match in detection_re.finditer(entry.name.lower()):
+                    if match.lastgroup == "loader":
+                        mod_loader_tokens.add(match.group())
+                        continue
+                    mods_versions.add(versions_by_lower[match.group()])
+                mod_mod_loader = next((loader for loader, token in LOADER_TOKENS if token in mod_loader_tokens), None)
+                if mod_mod_loader:
+                    mod_loader_matches[mod_mod_loader] += 1
+        if not mods:
+            spinner.fail("No mods found in the mods folder")
+            leave(True, silent=True)
+        if not mods_versions or not mod_loader_matches:
+            spinner.fail("Could not determine the Minecraft version or the mod loader from the mods file names")
+            leave(True, silent=True)
+        # The current version is the latest one found in the file names
+        current_mc_version = min(mods_versions, key=version_rank.__getitem__)
+        current_mod_loader = mod_loader_matches.most_common(1)[0][0]
         spinner.succeed(f"{Color.CYAN}mc-mods-checker v{VERSION}{Color.RESET} - "
                         f"Minecraft {Color.GREEN}{current_mc_version}{Color.RESET} "
                         f"({Color.MAGENTA}{current_mod_loader.name()}{Color.RESET} Mod Loader)")
@@ -199,40 +377,68 @@ if __name__ == "__main__":
             if select([f"Latest version ({mc_versions[0]})", f"Current version ({current_mc_version})"],
                       return_index=True) == 0:
                 wants_latest_version = True
+        target_mc_version = mc_versions[0] if wants_latest_version else current_mc_version
 
         # Map the mods to their CurseForge/Modrinth mod
         mods_map: dict[str, dict] = {}
         not_found_mods = []
-        spinner = Halo(
-            text=f"Finding installed mod{'s' if len(mods) > 1 else ''} on CurseForge and Modrinth (0/{len(mods)})"
-        )
+        spinner = Halo(text=f"Finding installed mod{'s' if len(mods) > 1 else ''} on CurseForge and Modrinth")
         spinner.start()
-        for index, mod in enumerate(mods):
-            # Update the spinner
-            spinner.text = f"Finding installed mod{'s' if len(mods) > 1 else ''} on CurseForge and Modrinth ({index + 1}/{len(mods)})"
-
-            # Build the query from the mod name
-            split_mod = mod.replace("_", "-").split("-")
-            first_numbered_word = next(element for element in split_mod if any(char.isdigit() for char in element))
-            first_words_before_number = split_mod[:split_mod.index(first_numbered_word)]
-            query_without_loader = first_words_before_number[:-1] \
-                if len(first_words_before_number) > 0 and first_words_before_number[-1] in ["fabric", "forge"] \
-                else first_words_before_number
-            search_query = " ".join(query_without_loader)
-
-            # Search for the mod in CurseForge
-            for search_method in SearchMethod:
-                result = search_method.search(
-                    search_query,
-                    current_mc_version if current_mc_version == mc_versions[0] or not wants_latest_version else mc_versions[0],
-                    current_mod_loader
-                )
-                if result:
-                    mods_map[mod] = result
-                    break
-
-            # If the mod was not found, add it to the list of not found mods
-            if not result:
+        found_mods: dict[str, dict] = {}
+        # Identify the mods from the hashes of their files first, with a single request per website
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            mod_hashes = dict(zip(mods, executor.map(file_hash, mods)))
+        try:
+            latest_versions = get_latest_versions(frozenset(mod_hashes.values()), target_mc_version,
+                                                  str(current_mod_loader))
+            if latest_versions:
+                projects = {project["id"]: project for project in get_projects(
+                    frozenset(latest_version["project_id"] for latest_version in latest_versions.values())
+                )}
+                for mod, mod_hash in mod_hashes.items():
+                    latest_version = latest_versions.get(mod_hash)
+                    if latest_version and latest_version["project_id"] in projects:
+                        found_mods[mod] = {**projects[latest_version["project_id"]], "files": latest_version["files"]}
+        except requests.exceptions.RequestException:
+            pass  # The lookup is only an optimization, the mods will be searched by name
+        unknown_mods = [mod for mod in mods if mod not in found_mods]
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            mod_fingerprints = dict(zip(unknown_mods, executor.map(curseforge_fingerprint, unknown_mods)))
+        if mod_fingerprints:
+            try:
+                fingerprint_matches = get_fingerprint_matches(frozenset(mod_fingerprints.values()))
+                if fingerprint_matches:
+                    curseforge_mods = {curseforge_mod["id"]: curseforge_mod for curseforge_mod in get_mods(
+                        frozenset(match["id"] for match in fingerprint_matches)
+                    )}
+                    matched_mod_ids = {match["file"]["fileFingerprint"]: match["id"] for match in fingerprint_matches}
+                    for mod, fingerprint in mod_fingerprints.items():
+                        if matched_mod_ids.get(fingerprint) in curseforge_mods:
+                            found_mods[mod] = curseforge_mods[matched_mod_ids[fingerprint]]
+            except requests.exceptions.RequestException:
+                pass  # The lookup is only an optimization, the mods will be searched by name
+
+        # Fall back to searching the remaining mods by name
+        mods_to_search = [mod for mod in mods if mod not in found_mods]
+        spinner_prefix = f"Searching the remaining mod{'s' if len(mods_to_search) > 1 else ''} on CurseForge and Modrinth"
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(find_mod, mod, target_mc_version, current_mod_loader): mod for mod in mods_to_search
+            }
+            last_spinner_update = 0.0
+            for index, future in enumerate(as_completed(futures)):
+                # Update the spinner
+                if time.monotonic() - last_spinner_update >= SPINNER_REFRESH_INTERVAL:
+                    spinner.text = f"{spinner_prefix} ({index + 1}/{len(mods_to_search)})"
+                    last_spinner_update = time.monotonic()
+                if result := future.result():
+                    found_mods[futures[future]] = result
+        # Gather the results in the order of the mods folder rather than the completion order
+        for mod in mods:
+            if mod in found_mods:
+                mods_map[mod] = found_mods[mod]
+            else:
+                # If the mod was not found, add it to the list of not found mods
                 not_found_mods.append(mod)
         # Update the spinner according to the results
         if not_found_mods:
@@ -298,20 +504,24 @@ if __name__ == "__main__":
                 leave(False)
 
             # Update the mods and send the old ones to the trash
-            spinner = Halo(text=f"Updating your mod{'s' if len(updates) > 1 else ''} (0/{len(updates)})")
+            spinner_prefix = f"Updating your mod{'s' if len(updates) > 1 else ''}"
+            spinner = Halo(text=f"{spinner_prefix} (0/{len(updates)})")
             spinner.start()
             update_failures = 0
-            for index, (current_file, update_file) in enumerate(updates.items()):
-                download_success, _ = download_file(update_file["downloadUrl"], update_file["fileName"])
-                spinner_msg = f"Updating your mod{'s' if len(updates) > 1 else ''} ({index + 1}/{len(updates)}) " \
-                              f"- Done: {update_file['fileName']}"
+            updated_files: list[str] = []
+            last_spinner_update = 0.0
+            for index, (current_file, update_file, download_success) in enumerate(download_files(updates)):
                 if download_success:
-                    send2trash(current_file)
+                    updated_files.append(current_file)
                 else:
                     update_failures += 1
-                if update_failures:
-                    spinner_msg += f" {Color.RED}({update_failures} failed){Color.RESET}"
-                spinner.text = spinner_msg
+                if time.monotonic() - last_spinner_update >= SPINNER_REFRESH_INTERVAL:
+                    spinner_msg = f"{spinner_prefix} ({index + 1}/{len(updates)}) - Done: {update_file['fileName']}"
+                    if update_failures:
+                        spinner_msg += " " + Color.RED.colorize(f"({update_failures} failed)")
+                    spinner.text = spinner_msg
+                    last_spinner_update = time.monotonic()
+            trash_files(updated_files, f".old-{current_mc_version}")
             if update_failures:
                 if update_failures == len(updates):
                     spinner.fail(f"Failed to update {update_failures} mod{'s' if update_failures > 1 else ''}")
@@ -365,10 +575,11 @@ if __name__ == "__main__":
                             )
                             if not selected_upgrades:
                                 leave(True, "Please select at least one mod to upgrade")
-                            skipped_upgrades = [old for index, (old, _) in enumerate(new_versions.items())
-                                                if index not in selected_upgrades] + [m for m in mods
-                                                                                      if m not in [old for old, _ in new_versions.items()]
-                                                                                      and m not in skipped_upgrades]
+                            selected_upgrades = set(selected_upgrades)
+                            # Skip the unselected upgrades and the mods without any upgrade
+                            skipped_upgrades = [old for index, old in enumerate(new_versions)
+                                                if index not in selected_upgrades]
+                            skipped_upgrades += [mod for mod in mods if mod not in new_versions]
                             new_versions = {
                                 old: new for index, (old, new) in enumerate(new_versions.items()) if
                                 index in selected_upgrades
@@ -381,8 +592,11 @@ if __name__ == "__main__":
                 leave(False)
 
             # Move the mods to a sub folder or trash
-            stores_previous_versions = [folder for folder in os.listdir()
-                                        if os.path.isdir(folder) and folder in mc_versions]
+            trash_executor = ThreadPoolExecutor(max_workers=1)
+            trash_future = None
+            with os.scandir() as entries:
+                stores_previous_versions = [entry.name for entry in entries
+                                            if entry.is_dir() and entry.name in mc_versions_set]
             if stores_previous_versions:
                 spinner = Halo(text=f"Moving your mod{'s' if len(mods) > 1 else ''} to {'their' if len(mods) > 1 else 'its'} sub folder")
                 spinner.start()
@@ -396,15 +610,17 @@ if __name__ == "__main__":
                 spinner = Halo(text=f"Copying back outdated mod{'s' if len(skipped_upgrades) > 1 else ''} for later upgrade")
                 spinner.start()
                 for mod in skipped_upgrades:
-                    shutil.copy(os.path.join(current_mc_version, mod), ".")
+                    link_or_copy(os.path.join(current_mc_version, mod), ".")
                 spinner.succeed(
                     f"Copied back {len(skipped_upgrades)} mod{'s' if len(skipped_upgrades) > 1 else ''} for later upgrade"
                 )
             else:
-                to_delete = [mod for mod in mods if mod not in skipped_upgrades]
+                skipped_upgrades_set = set(skipped_upgrades)
+                to_delete = [mod for mod in mods if mod not in skipped_upgrades_set]
                 spinner = Halo(text=f"Moving your mod{'s' if len(to_delete) > 1 else ''} to trash")
                 spinner.start()
-                send2trash(to_delete)
+                # The trash is emptied in the background while the new versions are downloaded
+                trash_future = trash_files(to_delete, f".old-{current_mc_version}", trash_executor)
                 spinner.succeed(f"Moved {len(to_delete)} mod{'s' if len(to_delete) > 1 else ''} to trash" +
                                 (" (skipped outdated mods for later upgrade)" if skipped_upgrades else ""))
 
@@ -413,18 +629,7 @@ if __name__ == "__main__":
                 spinner = Halo(text="Fabric detected, downloading Fabric Installer")
                 spinner.start()
                 # Fetch the latest version of Fabric Installer
-                for server in ["https://meta.fabricmc.net", "https://meta2.fabricmc.net"]:
-                    try:
-                        response = requests.get(f"{server}/v2/versions/installer")
-                        response.raise_for_status()
-                        installer_versions = response.json()
-                        # Set fabric_installer_url to the url of the first stable version
-                        for version in installer_versions:
-                            if version["stable"]:  # Stable version should always be the first/latest one
-                                fabric_installer_url = version["url"]
-                        break
-                    except requests.exceptions.RequestException:
-                        continue
+                fabric_installer_url = get_fabric_installer_url()
                 if not fabric_installer_url:
                     spinner.fail("Failed to fetch the latest version of Fabric Installer")
                     leave(True, silent=True)
@@ -438,9 +643,10 @@ if __name__ == "__main__":
 
                 # Close the Minecraft launcher if it is running
                 # kill any running Minecraft processes
-                for process in psutil.process_iter():
-                    if "minecraft" in process.name().lower():
-                        process.kill()
+                for process in psutil.process_iter(attrs=["name"], ad_value=""):
+                    if "minecraft" in process.info["name"].lower():
+                        with contextlib.suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+                            process.kill()
 
                 # Run Fabric Installer
                 spinner = Halo(text="Running Fabric Installer, please proceed with the installation and then close it")
@@ -458,20 +664,21 @@ if __name__ == "__main__":
                 spinner.succeed("Fabric Installer ran successfully")
 
             # Download mods for the latest version
-            spinner = Halo(
-                text=f"Downloading {len(new_versions)} mod{'s' if len(new_versions) > 1 else ''} for Minecraft {mc_versions[0]}"
-            )
+            spinner_prefix = f"Downloading {len(new_versions)} mod{'s' if len(new_versions) > 1 else ''} " \
+                             f"for Minecraft {mc_versions[0]}"
+            spinner = Halo(text=spinner_prefix)
             spinner.start()
             download_failures = 0
-            for index, (current_file, update_file) in enumerate(new_versions.items()):
-                download_success, _ = download_file(update_file["downloadUrl"], update_file["fileName"])
-                spinner_msg = f"Downloading {len(new_versions)} mod{'s' if len(new_versions) > 1 else ''} for Minecraft {mc_versions[0]} ({index + 1}/" \
-                              + f"{len(new_versions)})"
+            last_spinner_update = 0.0
+            for index, (_, _, download_success) in enumerate(download_files(new_versions)):
                 if not download_success:
                     download_failures += 1
-                if download_failures:
-                    spinner_msg += f" {Color.RED}({download_failures} failed){Color.RESET}"
-                spinner.text = spinner_msg
+                if time.monotonic() - last_spinner_update >= SPINNER_REFRESH_INTERVAL:
+                    spinner_msg = f"{spinner_prefix} ({index + 1}/{len(new_versions)})"
+                    if download_failures:
+                        spinner_msg += " " + Color.RED.colorize(f"({download_failures} failed)")
+                    spinner.text = spinner_msg
+                    last_spinner_update = time.monotonic()
             if download_failures:
                 if download_failures == len(new_versions):
                     spinner.fail(f"Failed to download {download_failures} mod{'s' if download_failures > 1 else ''}")
@@ -481,3 +688,7 @@ if __name__ == "__main__":
                     )
             else:
                 spinner.succeed(f"Downloaded {len(new_versions)} mod{'s' if len(new_versions) > 1 else ''}")
+            trash_executor.shutdown(wait=True)
+            if trash_future and trash_future.exception():
+                print(f"{Color.RED}Failed to send your old mods to the trash: {trash_future.exception()}, "
+                      f"they are in the .old-{current_mc_version} folder{Color.RESET}", file=sys.stderr)
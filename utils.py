@@ -1,14 +1,124 @@
 """Utility functions and classes."""
+import difflib
+import hashlib
 import inspect
 import os.path
+import string
 import sys
-from enum import Enum
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum, StrEnum
+from functools import lru_cache
 
 import enchant
 import requests
 
+import disk_cache
 from curseforge_api import search_mod
-from modrinth_api import search_mod as search_mod_modrinth, get_files_for_mod
+from modrinth_api import search_mod as search_mod_modrinth
+
+SLUG_TABLE = str.maketrans(string.ascii_uppercase + " ", string.ascii_lowercase + "-")
+SEARCH_HEDGE_DELAY = 1  # Time given to Modrinth to answer before searching CurseForge too, in seconds
+FUZZY_MATCH_CUTOFF = 0.8  # Minimum similarity of a result name with the mod name, from 0 to 1
+MAX_ENGLISH_WORD_LENGTH = 25  # Longer parts of a name are never checked against the dictionary
+
+_search_executor = ThreadPoolExecutor(max_workers=8)
+_dictionaries = threading.local()
+_dictionaries_lock = threading.Lock()
+
+
+def file_hash(path: str, algorithm: str = "sha512") -> str:
+    """
+    Compute the hash of a file.
+    :param path: The path of the file.
+    :param algorithm: The hashing algorithm to use, SHA-512 by default as it is Modrinth's primary hash.
+    :return: The hexadecimal digest of the file.
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, algorithm).hexdigest()
+
+
+def slugify(text: str) -> str:
+    """
+    Turn a text into a CurseForge slug, lowercase with dashes instead of spaces.
+    :param text: The text to turn into a slug.
+    :return: The slug.
+    """
+    if text.isascii():
+        return text.translate(SLUG_TABLE)  # Both changes in a single pass
+    return text.lower().replace(" ", "-")
+
+
+def murmur2(data: bytes, seed: int = 1) -> int:
+    """
+    Compute the 32-bit MurmurHash2 of some data.
+    :param data: The data to hash.
+    :param seed: The seed of the hash.
+    :return: The hash of the data.
+    """
+    m = 0x5BD1E995
+    length = len(data)
+    h = (seed ^ length) & 0xFFFFFFFF
+    # Unpack the 4-byte little-endian blocks in C rather than slicing them one by one
+    tail_start = length & ~3
+    blocks = array("I", data[:tail_start])
+    if sys.byteorder == "big":
+        blocks.byteswap()
+    for k in blocks:
+        k = (k * m) & 0xFFFFFFFF
+        h = ((h * m) ^ (((k ^ (k >> 24)) * m) & 0xFFFFFFFF)) & 0xFFFFFFFF
+    if tail := data[tail_start:]:
+        h ^= int.from_bytes(tail, "little")
+        h = (h * m) & 0xFFFFFFFF
+    h ^= h >> 13
+    h = (h * m) & 0xFFFFFFFF
+    h ^= h >> 15
+    return h
+
+
+def curseforge_fingerprint(path: str) -> int:
+    """
+    Compute the CurseForge fingerprint of a file, the MurmurHash2 of its content stripped of whitespace characters.
+    :param path: The path of the file.
+    :return: The fingerprint of the file.
+    """
+    with open(path, "rb") as f:
+        return murmur2(f.read().translate(None, b"\t\n\r "))
+
+
+def english_dictionary() -> enchant.Dict:
+    """
+    Get the english dictionary, downloading it first on Windows if it is missing.
+    Loading a dictionary is slow, so it is only done once per thread, as a dictionary can't be shared between threads.
+    :return: The english dictionary.
+    """
+    if not hasattr(_dictionaries, "en_us"):
+        with _dictionaries_lock:  # Don't download the dictionary from several threads at once
+            try:
+                _dictionaries.en_us = enchant.Dict("en_US")
+            except enchant.errors.DictNotFoundError:
+                if "win" in sys.platform:
+                    # On Windows, download the dictionary and add it to the enchant directory
+                    data_path = os.path.join(os.path.dirname(inspect.getfile(enchant)), "data")
+                    with os.scandir(data_path) as entries:
+                        mingw_path = next(entry.path for entry in entries
+                                          if entry.is_dir() and entry.name.startswith("mingw"))
+                    dicts_path = os.path.join(mingw_path, "share", "enchant", "hunspell")
+                    with open(f"{dicts_path}/en_US.dic", "xb") as f:
+                        f.write(
+                            requests.get("https://cgit.freedesktop.org/libreoffice/dictionaries/tree/en/en_US.dic").content
+                        )
+                    with open(f"{dicts_path}/en_US.aff", "xb") as f:
+                        f.write(
+                            requests.get("https://cgit.freedesktop.org/libreoffice/dictionaries/tree/en/en_US.aff").content
+                        )
+                else:
+                    print("The english dictionary is not installed. Please install"
+                          "`hunspell-en` or `en-hunspell` using your package manager.")
+                    exit(1)
+                _dictionaries.en_us = enchant.Dict("en_US")
+    return _dictionaries.en_us
 
 
 class ModLoader(Enum):
@@ -20,28 +130,28 @@ class ModLoader(Enum):
     QUILT = 5
 
     def __str__(self):
-        return self.name().lower()
+        return MOD_LOADER_IDS[self]
 
     def name(self):
         """
         Get the name of the mod loader.
         :return: The name of the mod loader.
         """
-        match self:
-            case ModLoader.FORGE:
-                return "Forge"
-            case ModLoader.CAULDRON:
-                return "Cauldron"
-            case ModLoader.LITELOADER:
-                return "LiteLoader"
-            case ModLoader.FABRIC:
-                return "Fabric"
-            case ModLoader.QUILT:
-                return "Quilt"
-
-
-class Color(Enum):
-    """Enum for the different colors."""
+        return MOD_LOADER_NAMES[self]
+
+
+MOD_LOADER_NAMES = {
+    ModLoader.FORGE: "Forge",
+    ModLoader.CAULDRON: "Cauldron",
+    ModLoader.LITELOADER: "LiteLoader",
+    ModLoader.FABRIC: "Fabric",
+    ModLoader.QUILT: "Quilt"
+}
+MOD_LOADER_IDS = {mod_loader: name.lower() for mod_loader, name in MOD_LOADER_NAMES.items()}
+
+
+class Color(StrEnum):
+    """Enum for the different colors. The colors are strings, usable as is in concatenations and f-strings."""
     RED = "\033[31m"
     GREEN = "\033[32m"
     YELLOW = "\033[33m"
@@ -50,11 +160,13 @@ class Color(Enum):
     CYAN = "\033[36m"
     RESET = "\033[0m"
 
-    def __add__(self, other):
-        return self.value + (other.value if isinstance(other, Color) else other)
-
-    def __str__(self):
-        return self.value
+    def colorize(self, text: str) -> str:
+        """
+        Color a text, resetting the color after it.
+        :param text: The text to color.
+        :return: The colored text.
+        """
+        return f"{self.value}{text}{Color.RESET.value}"
 
 
 class SearchWebsite(Enum):
@@ -72,66 +184,66 @@ class SearchMethod(Enum):
     CURSEFORGE_SPACED_QUERY = "Curseforge (query with spaces)"
 
     @staticmethod
+    @lru_cache(maxsize=512)
     def __add_spaces_from_uppercase(text: str):
         """
         Add spaces before uppercase letters if the previous letter is not an uppercase letter.
         More subtle checks are performed to add spaces as smartly as possible.
         """
-        new_text = ""
-        new_word = ""
+        new_text = []
+        # Track the letters of the current word instead of slicing it, to know if it is lowercase like str.islower()
+        word_has_lower = word_has_upper = False
         for i, char in enumerate(text):
-            if i > 0:
-                last_char = text[i - 1]
-                if char.isupper() and not last_char.isupper() and not text[i - len(new_word):i].islower():
-                    # Add a space before an uppercase letter if the previous letter is not an uppercase
-                    new_text += " "
-            new_text += char
+            if i > 0 and char.isupper() and not text[i - 1].isupper() and (word_has_upper or not word_has_lower):
+                # Add a space before an uppercase letter if the previous letter is not an uppercase
+                new_text.append(" ")
+            new_text.append(char)
             if char == " ":
                 # Save the beginning of a new word
-                new_word = ""
+                word_has_lower = word_has_upper = False
             else:
-                new_word += char
-        return new_text
+                word_has_lower = word_has_lower or char.islower()
+                word_has_upper = word_has_upper or char.isupper() or char.istitle()
+        return "".join(new_text)
 
     @staticmethod
+    @lru_cache(maxsize=512)
     def __add_spaces_from_dictionary(text: str):
         """Add spaces between words based on the english dictionary."""
-        try:
-            enchant.Dict("en_US")
-        except enchant.errors.DictNotFoundError:
-            if "win" in sys.platform:
-                # On Windows, download the dictionary and add it to the enchant directory
-                data_path = os.path.join(os.path.dirname(inspect.getfile(enchant)), "data")
-                dicts_path = os.path.join(
-                    data_path,
-                    [p for p in os.listdir(data_path) if p.startswith("mingw")][0],
-                    "share", "enchant", "hunspell"
-                )
-                with open(f"{dicts_path}/en_US.dic", "xb") as f:
-                    f.write(
-                        requests.get("https://cgit.freedesktop.org/libreoffice/dictionaries/tree/en/en_US.dic").content
-                    )
-                with open(f"{dicts_path}/en_US.aff", "xb") as f:
-                    f.write(
-                        requests.get("https://cgit.freedesktop.org/libreoffice/dictionaries/tree/en/en_US.aff").content
-                    )
-            else:
-                print("The english dictionary is not installed. Please install"
-                      "`hunspell-en` or `en-hunspell` using your package manager.")
-                exit(1)
-
-        d = enchant.Dict("en_US")
-        new_text = ""
-        worked_on_word = text
-        while worked_on_word:
-            for i in range(len(worked_on_word), 0, -1):
-                word = worked_on_word[:i]
-                if d.check(word):
-                    new_text += word
-                    if i != len(worked_on_word):
-                        new_text += " "
-                    worked_on_word = worked_on_word[i:]
-                    break
+        # The dictionary doesn't change, the splits are kept on disk to skip loading it on the next runs
+        cached = disk_cache.load("segmentations", text)
+        if cached:
+            return cached[-1]
+        d = english_dictionary()
+        new_words = []
+        for word in text.split(" "):
+            # For each prefix of the word, find the split with the fewest unknown characters, then the fewest words.
+            # best[i] holds the number of unknown characters and words of the prefix of length i,
+            # and the start of its last part
+            best = [(0, 0, 0)] + [None] * len(word)
+            for end in range(1, len(word) + 1):
+                # An unknown character is always a valid, yet costly, split
+                unknown_chars, words, _ = best[end - 1]
+                best[end] = (unknown_chars + 1, words + 1, end - 1)
+                for start in range(max(0, end - MAX_ENGLISH_WORD_LENGTH), end):
+                    unknown_chars, words, _ = best[start]
+                    if (unknown_chars, words + 1) < best[end][:2] and d.check(word[start:end]):
+                        best[end] = (unknown_chars, words + 1, start)
+            # Rebuild the split from the end
+            parts = []
+            end = len(word)
+            while end > 0:
+                start = best[end][2]
+                unknown = best[end][0] > best[start][0]
+                if unknown and parts and parts[-1][1]:
+                    # Keep the consecutive unknown characters together
+                    parts[-1] = (word[start:end] + parts[-1][0], True)
+                else:
+                    parts.append((word[start:end], unknown))
+                end = start
+            new_words.append(" ".join(part for part, _ in reversed(parts)))
+        new_text = " ".join(new_words)
+        disk_cache.store("segmentations", text, new_text)
         return new_text
 
     @staticmethod
@@ -139,75 +251,133 @@ class SearchMethod(Enum):
         """
         Find the closest match in the results based on the mod name.
         To do so, the first words of each result are compared to the mod name.
+        If none matches, the result with the most similar name is used if it is close enough,
+        rather than falling back to another search.
         """
         if not results:
             return None
         if len(results) == 1:
             return results[0]
+        words_count = mod_name.count(" ") + 1
+        mod_name_lower = mod_name.lower()
         for result in results:
-            result_first_words = " ".join(result["name"].split(" ")[:mod_name.count(" ") + 1]).lower()
-            if result_first_words == mod_name.lower():
+            # No need to split the rest of the name
+            result_first_words = " ".join(result["name"].split(" ", words_count)[:words_count]).lower()
+            if result_first_words == mod_name_lower:
+                return result
+        results_by_name = {result["name"].lower(): result for result in reversed(results)}  # Keep the first ones
+        closest_names = difflib.get_close_matches(mod_name_lower, results_by_name, n=1, cutoff=FUZZY_MATCH_CUTOFF)
+        return results_by_name[closest_names[0]] if closest_names else None
+
+    def query(self, name: str) -> str:
+        """Return the query sent by the search method for a mod name."""
+        if self == SearchMethod.MODRINTH_QUERY:
+            return name  # Modrinth handles the raw name, no need to split it
+        spaced = self.__add_spaces_from_uppercase(name)
+        if self == SearchMethod.CURSEFORGE_SLUG or self == SearchMethod.CURSEFORGE_QUERY or spaced != name:
+            # The uppercase letters already delimited the words, the dictionary is only needed when they didn't
+            return spaced
+        return self.__add_spaces_from_dictionary(name)
+
+    def request_key(self, name: str) -> tuple:
+        """
+        Return what determines the result of the search method for a mod name.
+        Two search methods with the same key return the same result, for instance when both slugs are identical.
+        """
+        query = self.query(name)
+        match self:
+            case SearchMethod.MODRINTH_QUERY:
+                return SearchWebsite.MODRINTH, query
+            case SearchMethod.CURSEFORGE_SLUG | SearchMethod.CURSEFORGE_SPACED_SLUG:
+                return SearchWebsite.CURSEFORGE, "slug", slugify(query)
+            case SearchMethod.CURSEFORGE_QUERY | SearchMethod.CURSEFORGE_SPACED_QUERY:
+                return SearchWebsite.CURSEFORGE, "query", query, name if self == SearchMethod.CURSEFORGE_QUERY else query
+
+    @classmethod
+    def search_in_order(cls, name: str, version: str, mod_loader: ModLoader,
+                        methods: tuple["SearchMethod", ...] = None) -> dict | None:
+        """
+        Search a mod with each search method in turn, skipping the ones that would repeat an unsuccessful search.
+        :param name: The name of the mod.
+        :param version: The Minecraft version to search the mod for.
+        :param mod_loader: The mod loader to search the mod for.
+        :param methods: <Optional> The search methods to try, in order. All of them by default.
+        :return: The mod found with the first successful search method, None otherwise.
+        """
+        tried_requests = set()
+        for method in methods or tuple(cls):
+            request_key = method.request_key(name)
+            if request_key in tried_requests:
+                continue
+            tried_requests.add(request_key)
+            result = method.search(name, version, mod_loader)
+            if result:
                 return result
+        return None
+
+    @classmethod
+    def search_best(cls, name: str, version: str, mod_loader: ModLoader) -> dict | None:
+        """
+        Search a mod on Modrinth, then on CurseForge, keeping the priority of the search methods.
+        CurseForge is only searched if Modrinth doesn't find the mod, or doesn't answer within SEARCH_HEDGE_DELAY:
+        then both websites are searched at the same time, at the cost of a CurseForge search that may be useless.
+        :param name: The name of the mod.
+        :param version: The Minecraft version to search the mod for.
+        :param mod_loader: The mod loader to search the mod for.
+        :return: The mod found with the first successful search method, None otherwise.
+        """
+        modrinth_future = _search_executor.submit(SearchMethod.MODRINTH_QUERY.search, name, version, mod_loader)
+        try:
+            result = modrinth_future.result(timeout=SEARCH_HEDGE_DELAY)
+        except TimeoutError:
+            pass  # Modrinth is slow, search CurseForge meanwhile
+        else:
+            if result:
+                return result
+        curseforge_methods = tuple(method for method in cls if method != SearchMethod.MODRINTH_QUERY)
+        curseforge_result = cls.search_in_order(name, version, mod_loader, curseforge_methods)
+        return modrinth_future.result() or curseforge_result
 
     def search(self, name: str, version: str, mod_loader: ModLoader) -> dict | None:
         """Return the mod that matches the name and version using the search method."""
-        query = self.__add_spaces_from_uppercase(name) \
-            if self == SearchMethod.CURSEFORGE_SLUG or self == SearchMethod.CURSEFORGE_QUERY \
-            else self.__add_spaces_from_dictionary(name)
+        query = self.query(name)
         match self:
             case SearchMethod.MODRINTH_QUERY:
                 search = search_mod_modrinth(
                     version=version,
-                    mod_loader=mod_loader.name().lower(),
-                    query=name
-                )
-                if search:
-                    first_result = search[0]
-                    files = get_files_for_mod(first_result["slug"], version, mod_loader.name().lower())
-                    return {**first_result, "files": [file for sublist in files for file in sublist]}
-            case SearchMethod.CURSEFORGE_SLUG:
-                search = search_mod(
-                    version=version,
-                    mod_loader=mod_loader.value,
-                    slug=query.lower().replace(" ", "-")
-                )
-                if search:
-                    return search[0]
-            case SearchMethod.CURSEFORGE_QUERY:
-                search = search_mod(
-                    version=version,
-                    mod_loader=mod_loader.value,
+                    mod_loader=str(mod_loader),
                     query=query
                 )
                 if search:
-                    return self.__find_closest_match(search, name)
-            case SearchMethod.CURSEFORGE_SPACED_SLUG:
+                    # The files are fetched afterward, by the caller
+                    return search[0]
+            case SearchMethod.CURSEFORGE_SLUG | SearchMethod.CURSEFORGE_SPACED_SLUG:
                 search = search_mod(
                     version=version,
                     mod_loader=mod_loader.value,
-                    slug=query.lower().replace(" ", "-")
+                    slug=slugify(query)
                 )
                 if search:
                     return search[0]
-            case SearchMethod.CURSEFORGE_SPACED_QUERY:
+            case SearchMethod.CURSEFORGE_QUERY | SearchMethod.CURSEFORGE_SPACED_QUERY:
                 search = search_mod(
                     version=version,
                     mod_loader=mod_loader.value,
                     query=query
                 )
                 if search:
-                    return self.__find_closest_match(search, query)
+                    # The unspaced query is matched against the original name
+                    return self.__find_closest_match(search, name if self == SearchMethod.CURSEFORGE_QUERY else query)
 
     def color(self):
         """Return the color associated with the search method. Used for debugging."""
-        match self:
-            case SearchMethod.MODRINTH_QUERY:
-                return Color.RED
-            case SearchMethod.CURSEFORGE_SLUG:
-                return Color.BLUE
-            case SearchMethod.CURSEFORGE_QUERY:
-                return Color.GREEN
-            case SearchMethod.CURSEFORGE_SPACED_SLUG:
-                return Color.MAGENTA
-            case SearchMethod.CURSEFORGE_SPACED_QUERY:
-                return Color.CYAN
+        return SEARCH_METHOD_COLORS[self]
+
+
+SEARCH_METHOD_COLORS = {
+    SearchMethod.MODRINTH_QUERY: Color.RED,
+    SearchMethod.CURSEFORGE_SLUG: Color.BLUE,
+    SearchMethod.CURSEFORGE_QUERY: Color.GREEN,
+    SearchMethod.CURSEFORGE_SPACED_SLUG: Color.MAGENTA,
+    SearchMethod.CURSEFORGE_SPACED_QUERY: Color.CYAN
+}